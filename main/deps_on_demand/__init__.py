@@ -1,22 +1,54 @@
 from __future__ import annotations
 
-import importlib
-import json
+from importlib import import_module as _import_module
+from bisect import bisect_left
+from functools import lru_cache, partial
+import sys
 from pathlib import Path
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 DEFAULT_INSTALL_MESSAGE = None  # default; per-module install hints come from JSON
 
+# Shared (never mutated) empties for the many summary nodes without children/eager names.
+_NO_CHILDREN: Dict[str, int] = {}
+_NO_EAGER: frozenset[str] = frozenset()
+# Placeholder for "not computed yet": LazyModuleProxy._obj before the first load (one
+# identity check instead of a separate loaded flag) and shim nodes not built yet.
+_UNLOADED: Any = object()
 
-def _missing_dep_error(modname: str, install_message: Optional[str] = None) -> ModuleNotFoundError:
+
+@lru_cache(maxsize=64)
+def _missing_dep_message(modname: str, hint: Optional[str]) -> str:
     msg = f"Optional dependency {modname!r} is required for this feature."
-    hint = install_message or DEFAULT_INSTALL_MESSAGE
     if hint:
         msg += f"\n\n{hint}"
-    return ModuleNotFoundError(msg)
+    return msg
+
+
+def _missing_dep_error(modname: str, install_message: Optional[str] = None) -> ModuleNotFoundError:
+    # Only the message is cached: a shared instance would pile up __traceback__/__context__ across raises.
+    return ModuleNotFoundError(_missing_dep_message(modname, install_message or DEFAULT_INSTALL_MESSAGE))
+
+
+def _raise_missing(modname: str, install_message: Optional[str], *args: Any, **kwargs: Any) -> Any:
+    raise _missing_dep_error(modname, install_message)
+
+
+def _shim_type_getattr(cls: type, name: str) -> Any:
+    # Read _shim_ns from the class dict: going through getattr would recurse here when it is absent.
+    ns = cls.__dict__.get("_shim_ns")
+    if ns is not None:
+        try:
+            return getattr(ns, name)
+        except AttributeError:
+            pass
+    raise AttributeError(f"type object {cls.__name__!r} has no attribute {name!r}")
 
 
 class _MissingTypeMeta(type):
+    # One shared hook for every shim type: class attribute access falls back to its namespace.
+    __getattr__ = _shim_type_getattr
+
     def __call__(cls, *args: Any, **kwargs: Any) -> Any:  # type: ignore[override]
         raise _missing_dep_error(
             getattr(cls, "__shim_modname__", cls.__name__),
@@ -24,78 +56,138 @@ class _MissingTypeMeta(type):
         )
 
 
+def _summary_columns(summary: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, int]], List[List[str]]]:
+    """
+    Return the (kinds, children, eager) arrays of a summary, indexed by node id.
+    Summaries written before the array layout keep a str-keyed "nodes" dict instead.
+    """
+    if "nodes" not in summary:
+        return summary["kinds"], summary["children"], summary["eager"]
+    nodes = summary["nodes"]
+    ordered = [nodes[str(nid)] for nid in range(len(nodes))]
+    return (
+        [n["kind"] for n in ordered],
+        [n.get("children") or _NO_CHILDREN for n in ordered],
+        [n.get("eager") or () for n in ordered],
+    )
+
+
 class _ShimRuntime:
+    """
+    Build placeholder objects for a module from its summary, shaped as
+    {"root": int, "kinds": [...], "children": [{name: int}], "eager": [[name]]}
+    where every node id is a JSON number indexing the three arrays. Older str-keyed
+    "nodes" summaries are converted once by _summary_columns.
+    """
+
     def __init__(self, modname: str, summary: Dict[str, Any], install_message: Optional[str]) -> None:
-        self._modname = modname
-        self._nodes: Dict[str, Any] = summary["nodes"]
-        self._memo: Dict[str, Any] = {}
+        self._modname = sys.intern(modname)
+        self._kinds, self._children, self._eager = _summary_columns(summary)
         self._install_message = install_message
+        # Every "fn" node is the same stand-in: calling any of them only raises.
+        self._missing_fn = partial(_raise_missing, self._modname, install_message)
+        # Nodes are realized on first use: a summary can hold tens of thousands of them
+        # and the first access of a missing module typically touches only a handful.
+        self._memo: List[Any] = [_UNLOADED] * len(self._kinds)
+        self._make = {"fn": self._make_fn, "type": self._make_type, "ns": self._make_ns}
 
     def get(self, node_id: int) -> Any:
-        sid = str(node_id)
-        if sid in self._memo:
-            return self._memo[sid]
-
-        n = self._nodes[sid]
-        kind = n["kind"]
-
-        if kind == "fn":
-            def _missing_fn(*args: Any, **kwargs: Any) -> Any:
-                raise _missing_dep_error(self._modname, self._install_message)
-            self._memo[sid] = _missing_fn
-            return _missing_fn
-
-        if kind == "type":
-            T = _MissingTypeMeta(f"Missing_{self._modname}_{sid}", (), {})
-            setattr(T, "__shim_modname__", self._modname)
-            setattr(T, "__shim_install_message__", self._install_message)
-            self._memo[sid] = T
-            ns = _ShimNamespace(self, self._modname, sid)
-            setattr(T, "_shim_ns", ns)
-            def _type_getattr(self_or_cls: Any, name: str) -> Any:
-                return getattr(getattr(T, "_shim_ns"), name)
-            setattr(T, "__getattr__", staticmethod(_type_getattr))
-            return T
-
-        if kind == "ns":
-            obj = _ShimNamespace(self, self._modname, sid)
-            self._memo[sid] = obj
-            return obj
+        obj = self._memo[node_id]
+        if obj is _UNLOADED:
+            kind = self._kinds[node_id]
+            builder = self._make.get(kind)
+            if builder is None:
+                raise RuntimeError(f"Unknown node kind: {kind!r}")
+            obj = self._memo[node_id] = builder(node_id)
+        return obj
+
+    def _make_fn(self, node_id: int) -> Any:
+        return self._missing_fn
 
-        raise RuntimeError(f"Unknown node kind: {kind!r}")
+    def _make_type(self, node_id: int) -> Any:
+        T = _MissingTypeMeta(f"Missing_{self._modname}_{node_id}", (), {})
+        setattr(T, "__shim_modname__", self._modname)
+        setattr(T, "__shim_install_message__", self._install_message)
+        ns = _ShimNamespace(self, self._modname, node_id)
+        setattr(T, "_shim_ns", ns)
+        return T
 
+    def _make_ns(self, node_id: int) -> Any:
+        return _ShimNamespace(self, self._modname, node_id)
 
-class _ShimNamespace:
-    __slots__ = ("_rt", "_modname", "_sid")
 
-    def __init__(self, rt: _ShimRuntime, modname: str, sid: str) -> None:
+class _PromotingSlots:
+    """
+    Base for slotted objects that cache resolved attributes in their instance dict (via
+    _promote), so repeat lookups are plain instance hits that never reach __getattr__.
+    The dict is private: the __dict__ property shadows the slot's descriptor, and
+    assignment/deletion only reach the subclass's own slots, so the public surface is
+    that of a plain slotted object.
+    """
+
+    __slots__ = ("__dict__",)
+
+    @property
+    def __dict__(self) -> Any:  # type: ignore[override]
+        raise AttributeError("__dict__")
+
+    def _promote(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name not in type(self).__slots__:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if name not in type(self).__slots__:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        object.__delattr__(self, name)
+
+
+class _ShimNamespace(_PromotingSlots):
+    __slots__ = ("_rt", "_modname", "_nid", "_children", "_eager", "_dir")
+
+    def __init__(self, rt: _ShimRuntime, modname: str, nid: int) -> None:
         self._rt = rt
         self._modname = modname
-        self._sid = sid
+        self._nid = nid
+        # This node's columns, held directly so lookups skip the runtime's lists. Interned
+        # keys let lookups by attribute name (already interned) match on identity.
+        children = rt._children[nid]
+        eager = rt._eager[nid]
+        self._children = {sys.intern(k): v for k, v in children.items()} if children else _NO_CHILDREN
+        self._eager = frozenset(map(sys.intern, eager)) if eager else _NO_EAGER
+        self._dir: Optional[List[str]] = None
 
     def __getattr__(self, name: str) -> Any:
-        node = self._rt._nodes[self._sid]
-        if name in node.get("eager", []):
+        if name in self._eager:
             raise _missing_dep_error(self._modname, self._rt._install_message)
-        children = node.get("children", {})
-        if name in children:
-            return self._rt.get(children[name])
+        child_id = self._children.get(name)
+        if child_id is not None:
+            value = self._rt.get(child_id)
+            self._promote(name, value)
+            return value
         raise AttributeError(name)
 
     def __dir__(self) -> list[str]:
-        node = self._rt._nodes[self._sid]
-        return sorted(set(node.get("children", {}).keys()) | set(node.get("eager", [])))
+        # Children and eager names never change after construction.
+        if self._dir is None:
+            self._dir = sorted(self._children.keys() | self._eager)
+        return self._dir
 
     def __repr__(self) -> str:
-        return f"<MissingOptionalDependency shim {self._modname!r} node={self._sid}>"
+        return f"<MissingOptionalDependency shim {self._modname!r} node={self._nid}>"
 
 
-class LazyModuleProxy:
+class LazyModuleProxy(_PromotingSlots):
     """
     Lazily import the real module on first attribute access, or fall back to a
     shim built from a stored JSON summary. Accepts either:
       - (modname, summary_dict) for direct construction, or
-      - (stem_name, base_path) where base_path/stem_name.json holds {"module", "summary"}.
+      - (stem_name, base_path) where base_path/stem_name.json (or .json.zst) holds {"module", "summary"}.
+    With a base_path, passing `module` (and optionally `extra`/`explicit_child_modules`)
+    up front means the JSON file is only read if the real import fails.
     """
 
     __slots__ = (
@@ -105,66 +197,92 @@ class LazyModuleProxy:
         "_summary",
         "_install_message",
         "_explicit_children",
-        "_explicit_trie",
-        "_loaded",
         "_obj",
+        "_unloaded_dir",
     )
 
-    def __init__(self, mod_identifier: str, summary_or_base: Any) -> None:
+    def __init__(
+        self,
+        mod_identifier: str,
+        summary_or_base: Any,
+        *,
+        module: Optional[str] = None,
+        extra: Optional[str] = None,
+        explicit_child_modules: Optional[Iterable[str]] = None,
+    ) -> None:
         self._stem = mod_identifier
         self._base: Optional[Path] = None
         self._modname: Optional[str] = None
         self._summary: Optional[Dict[str, Any]] = None
         self._install_message: Optional[str] = None
-        self._explicit_children: Set[str] = set()
-        self._explicit_trie: Dict[str, Any] = {}
-        self._loaded = False
-        self._obj: Optional[Any] = None
+        self._explicit_children: Tuple[str, ...] = ()
+        self._obj: Any = _UNLOADED
+        self._unloaded_dir: Optional[List[str]] = None
 
         if isinstance(summary_or_base, dict):
             self._modname = mod_identifier
             self._summary = summary_or_base
         else:
             self._base = Path(summary_or_base)
+        if module is not None:
+            self._set_module_info(module, extra, explicit_child_modules or ())
+
+    def _set_module_info(self, module: str, extra: Optional[str], explicit_child_modules: Iterable[str]) -> None:
+        self._modname = module
+        if extra:
+            self._install_message = f"pip install .[{extra}]"
+        self._explicit_children = tuple(sorted(explicit_child_modules))
+
+    def _ensure_module_info(self) -> None:
+        if self._modname is None:
+            self._ensure_summary()
 
     def _ensure_summary(self) -> None:
         if self._summary is not None and self._modname is not None:
             return
         if self._base is None:
             raise RuntimeError("LazyModuleProxy missing summary and base path")
-        path = self._base / f"{self._stem}.json"
+        # Imported here, not at the top: helpers (and its optional decoders) are only
+        # needed on the missing-module fallback, so importing this package stays cheap.
+        from deps_on_demand.helpers import bundle_path, read_bundle
+
+        path = bundle_path(self._base, self._stem)
         try:
-            with path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = read_bundle(path)
         except FileNotFoundError as e:
             raise FileNotFoundError(f"shim summary file not found: {path}") from e
-        self._modname = data.get("module", self._stem)
+        if self._modname is None:
+            self._set_module_info(
+                data.get("module", self._stem),
+                data.get("extra"),
+                data.get("explicit_child_modules", []),
+            )
         self._summary = data.get("summary")
-        extra = data.get("extra")
-        if extra:
-            self._install_message = f"pip install .[{extra}]"
-        self._explicit_children = set(data.get("explicit_child_modules", []))
-        self._explicit_trie = self._build_trie(self._explicit_children)
         if self._summary is None:
             raise RuntimeError(f"shim summary missing for {self._stem!r} in {path}")
 
-    def _build_trie(self, paths: Set[str]) -> Dict[str, Any]:
-        trie: Dict[str, Any] = {}
-        if not self._modname:
-            return trie
-        prefix = f"{self._modname}."
-        for p in paths:
-            if not p.startswith(prefix):
-                continue
-            segs = p[len(prefix) :].split(".")
-            node = trie
-            for i, seg in enumerate(segs):
-                node = node.setdefault(seg, {"module": None, "children": {}})
-                if i == len(segs) - 1:
-                    node["module"] = p
-                else:
-                    node = node["children"]
-        return trie
+    def _explicit_lookup(self, dotted: str) -> Tuple[bool, bool]:
+        """
+        Return (is_module, has_children) for a dotted path among the explicit child
+        modules, using binary search over the sorted names.
+        """
+        mods = self._explicit_children
+        i = bisect_left(mods, dotted)
+        is_module = i < len(mods) and mods[i] == dotted
+        prefix = f"{dotted}."
+        j = bisect_left(mods, prefix, i)
+        has_children = j < len(mods) and mods[j].startswith(prefix)
+        return is_module, has_children
+
+    def _explicit_child_names(self, dotted: str) -> Set[str]:
+        mods = self._explicit_children
+        prefix = f"{dotted}."
+        names: Set[str] = set()
+        for i in range(bisect_left(mods, prefix), len(mods)):
+            if not mods[i].startswith(prefix):
+                break
+            names.add(mods[i][len(prefix) :].split(".", 1)[0])
+        return names
 
     def _resolve_loaded_attr(self, segments: list[str]) -> Any:
         obj = self._load()
@@ -173,36 +291,41 @@ class LazyModuleProxy:
         return obj
 
     def _load(self, module_to_import: Optional[str] = None) -> Any:
-        if self._loaded:
-            return self._obj
+        obj = self._obj
+        if obj is not _UNLOADED:
+            return obj
 
-        self._ensure_summary()
+        self._ensure_module_info()
         assert self._modname is not None
-        assert self._summary is not None
 
         target = module_to_import or self._modname
         try:
-            importlib.import_module(target)
+            # sys.modules first: already-imported modules skip the import lock and finder walk.
+            sys.modules.get(target) or _import_module(target)
             # Ensure root module object is returned.
-            mod = importlib.import_module(self._modname)
+            mod = sys.modules.get(self._modname) or _import_module(self._modname)
         except ModuleNotFoundError:
+            # Only the fallback needs the (potentially large) summary.
+            self._ensure_summary()
+            assert self._summary is not None
             rt = _ShimRuntime(self._modname, self._summary, self._install_message)
             mod = rt.get(self._summary["root"])
         self._obj = mod
-        self._loaded = True
         return mod
 
     def __getattr__(self, name: str) -> Any:
-        if not self._loaded:
-            self._ensure_summary()
-        # If the attribute is an explicit child subtree, return an intermediate proxy
-        # that will import the child module when deeper attributes are accessed.
-        if not self._loaded and name in self._explicit_trie:
-            return _IntermediateNamespace(self, self._explicit_trie[name], [name])
+        if self._obj is _UNLOADED:
+            self._ensure_module_info()
+            # If the attribute is an explicit child subtree, return an intermediate proxy
+            # that will import the child module when deeper attributes are accessed.
+            if self._explicit_children:
+                dotted = f"{self._modname}.{name}"
+                if any(self._explicit_lookup(dotted)):
+                    return _IntermediateNamespace(self, dotted, [name])
 
         obj = self._load()
         try:
-            return getattr(obj, name)
+            value = getattr(obj, name)
         except AttributeError:
             # If the requested attribute belongs to an explicit child module, make sure
             # that child is imported before retrying (handles packages that don't
@@ -211,62 +334,90 @@ class LazyModuleProxy:
                 tail = child.rsplit(".", 1)[-1]
                 if child.startswith(f"{self._modname}.") and tail == name:
                     try:
-                        importlib.import_module(child)
+                        _import_module(child)
                     except BaseException:
                         pass
                     break
-        return getattr(obj, name)
+            value = getattr(obj, name)
+        # Only the shim's graph is fixed; a real module can be patched, reloaded or
+        # monkeypatched later, so its attributes are looked up fresh every time.
+        if isinstance(obj, _ShimNamespace):
+            self._promote(name, value)
+        return value
+
+    @property
+    def __dict__(self) -> Any:  # type: ignore[override]
+        # vars(proxy) is the real module's namespace, not the promotion cache.
+        return self._load().__dict__
+
+    # Unlike a shim namespace, public writes go through to the module.
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in LazyModuleProxy.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if name in LazyModuleProxy.__slots__:
+            object.__delattr__(self, name)
+        else:
+            delattr(self._load(), name)
 
     def __dir__(self) -> list[str]:
-        if self._loaded and self._obj is not None:
-            return sorted(set(dir(self._obj)))
+        obj = self._obj
+        if obj is not _UNLOADED and obj is not None:
+            return sorted(set(dir(obj)))
+        if self._unloaded_dir is not None:
+            return self._unloaded_dir
         self._ensure_summary()
         assert self._summary is not None
-        node = self._summary["nodes"][str(self._summary["root"])]
-        names = set(node.get("children", {}).keys()) | set(node.get("eager", []))
-        names |= set(self._explicit_trie.keys())
-        return sorted(names)
+        _kinds, children, eager = _summary_columns(self._summary)
+        root = self._summary["root"]
+        names = set(children[root].keys()) | set(eager[root])
+        assert self._modname is not None
+        names |= self._explicit_child_names(self._modname)
+        self._unloaded_dir = sorted(names)
+        return self._unloaded_dir
 
     def __repr__(self) -> str:
-        if not self._loaded:
+        if self._obj is _UNLOADED:
             return f"<LazyModuleProxy for {self._stem!r}>"
         return repr(self._obj)
 
 
 class _IntermediateNamespace:
-    __slots__ = ("_proxy", "_node", "_segments")
+    __slots__ = ("_proxy", "_dotted", "_segments")
 
-    def __init__(self, proxy: LazyModuleProxy, trie_node: Dict[str, Any], segments: list[str]) -> None:
+    def __init__(self, proxy: LazyModuleProxy, dotted: str, segments: list[str]) -> None:
         self._proxy = proxy
-        self._node = trie_node
+        self._dotted = dotted
         self._segments = segments
 
     def __getattr__(self, name: str) -> Any:
         # If root already loaded, resolve directly.
-        if self._proxy._loaded:
+        if self._proxy._obj is not _UNLOADED:
             return self._proxy._resolve_loaded_attr(self._segments + [name])
 
-        children = self._node.get("children", {})
-        if name in children:
-            child_node = children[name]
-            if child_node.get("module"):
-                # Leaf: import the child module, then resolve attribute chain.
-                self._proxy._load(module_to_import=child_node["module"])
-                return self._proxy._resolve_loaded_attr(self._segments + [name])
-            return _IntermediateNamespace(self._proxy, child_node, self._segments + [name])
+        child = f"{self._dotted}.{name}"
+        is_module, has_children = self._proxy._explicit_lookup(child)
+        if is_module:
+            # Leaf: import the child module, then resolve attribute chain.
+            self._proxy._load(module_to_import=child)
+            return self._proxy._resolve_loaded_attr(self._segments + [name])
+        if has_children:
+            return _IntermediateNamespace(self._proxy, child, self._segments + [name])
 
         # If this node itself represents a module, try importing it before resolving.
-        module_path = self._node.get("module")
-        if module_path:
-            self._proxy._load(module_to_import=module_path)
+        if self._proxy._explicit_lookup(self._dotted)[0]:
+            self._proxy._load(module_to_import=self._dotted)
             return self._proxy._resolve_loaded_attr(self._segments + [name])
 
         # Fallback: load root and resolve.
         return self._proxy._resolve_loaded_attr(self._segments + [name])
 
     def __dir__(self) -> list[str]:
-        names = set(self._node.get("children", {}).keys())
-        if self._node.get("module"):
+        names = self._proxy._explicit_child_names(self._dotted)
+        if self._proxy._explicit_lookup(self._dotted)[0]:
             try:
                 obj = self._proxy._resolve_loaded_attr(self._segments)
                 names |= set(dir(obj))
@@ -4,28 +4,31 @@ from __future__ import annotations
 import argparse
 import importlib
 import inspect
-import json
 import keyword
-import pkgutil
+import os
 import re
 import sys
+import types
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from contextlib import redirect_stdout, redirect_stderr, contextmanager
 from io import StringIO
 
 import importlib.metadata as importlib_metadata
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import tomllib
 
+from deps_on_demand.helpers import bundle_path, dump_bundle, read_bundle, submodules_requiring_import, zstandard
+
 
 # -------------------------
 # Summary data model
 # -------------------------
 
-@dataclass
+@dataclass(slots=True)
 class SumNode:
     kind: str                    # "ns" | "type" | "fn"
     children: Dict[str, int] = field(default_factory=dict)
@@ -36,41 +39,82 @@ def is_public_name(name: str, include_private: bool) -> bool:
     return include_private or not name.startswith("_")
 
 
-def safe_iter_members(obj: Any) -> List[Tuple[str, Any]]:
+def safe_iter_members(obj: Any) -> Iterable[Tuple[str, Any]]:
     """
     Prefer __dict__ to avoid triggering properties/descriptors.
+    The items view is returned as-is; the summary walk only reads from it.
     """
     d = getattr(obj, "__dict__", None)
     if isinstance(d, dict):
-        return list(d.items())
-    return []
+        return d.items()
+    return ()
+
+
+def _iter_public_members(obj: Any, include_private: bool) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield the (interned name, value) pairs of safe_iter_members that the summary keeps:
+    string keys only, and no private names unless include_private.
+    """
+    skip_private = not include_private
+    for name, val in safe_iter_members(obj):
+        if not isinstance(name, str):
+            continue
+        if skip_private and name[:1] == "_":
+            continue
+        # str subclasses can legitimately be __dict__ keys, but neither sys.intern nor
+        # orjson accepts them, so they are normalized to plain str.
+        yield sys.intern(name if type(name) is str else str.__str__(name)), val
+
+
+# Classification of non-class values only depends on type(v), so it is cached per type.
+_KIND_BY_TYPE: Dict[type, str] = {}
+
+_FUNCTION_TYPES = (
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodDescriptorType,
+    types.WrapperDescriptorType,
+    types.ClassMethodDescriptorType,
+)
 
 
 def classify_value(v: Any) -> str:
     """
     Return one of: "ns" | "type" | "fn" | "eager"
     """
-    if inspect.ismodule(v):
-        return "ns"
-
-    if inspect.isclass(v):
+    t = type(v)
+    if t is type or issubclass(t, type):
         # builtins like int/list/str should be eager (raise on-get)
         if getattr(v, "__module__", None) == "builtins":
             return "eager"
         return "type"
 
-    if inspect.isfunction(v) or inspect.isbuiltin(v) or inspect.ismethoddescriptor(v):
-        return "fn"
+    kind = _KIND_BY_TYPE.get(t)
+    if kind is not None:
+        return kind
+
+    if isinstance(v, types.ModuleType):
+        kind = "ns"
+    elif isinstance(v, _FUNCTION_TYPES) or inspect.ismethoddescriptor(v):
+        # ismethoddescriptor still covers other non-data descriptors (staticmethod, etc.)
+        kind = "fn"
+    else:
+        # Other callables (instances w/ __call__) -> treat as eager on-get
+        kind = "eager"
+
+    _KIND_BY_TYPE[t] = kind
+    return kind
 
-    # Other callables (instances w/ __call__) -> treat as eager on-get
-    if callable(v):
-        return "eager"
 
-    return "eager"
+_SANITIZE_RE = re.compile(r"[^0-9a-zA-Z_]")
+_DEP_NAME_RE = re.compile(r"[A-Za-z0-9_.-]+")
 
 
 def sanitize_identifier(name: str) -> str:
-    s = re.sub(r"[^0-9a-zA-Z_]", "_", name)
+    # Most names come straight from __dict__/import names and are already valid.
+    if name.isascii() and name.isidentifier() and not keyword.iskeyword(name):
+        return name
+    s = _SANITIZE_RE.sub("_", name)
     if not s:
         s = "_"
     if s[0].isdigit():
@@ -80,49 +124,6 @@ def sanitize_identifier(name: str) -> str:
     return s
 
 
-def _normalize_name(name: str) -> str:
-    """PEP 503-style normalization: lowercase and replace runs of -_. with -."""
-    return re.sub(r"[-_.]+", "-", name).lower()
-
-
-def _submodules_requiring_import(modname: str) -> List[str]:
-    """
-    List submodules under `modname` that are not already accessible as attributes
-    after importing `modname` itself.
-    """
-    root = _quiet_import(modname)
-    if not hasattr(root, "__path__"):
-        return []
-
-    base_parts = modname.split(".")
-    need_import: List[str] = []
-
-    with _silence_imports():
-        for info in pkgutil.walk_packages(root.__path__, root.__name__ + "."):
-            full = info.name
-            rel_parts = full.split(".")[len(base_parts):]
-
-            obj = root
-            missing = False
-            for part in rel_parts:
-                if not hasattr(obj, part):
-                    missing = True
-                    break
-                obj = getattr(obj, part)
-            if missing:
-                need_import.append(full)
-
-    return sorted(need_import)
-
-
-def _quiet_import(modname: str) -> Any:
-    buf = StringIO()
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        with redirect_stdout(buf), redirect_stderr(buf):
-            return importlib.import_module(modname)
-
-
 @contextmanager
 def _silence_imports() -> Any:
     buf = StringIO()
@@ -142,45 +143,40 @@ def build_summary(
 
     Back-edges are represented by reusing node IDs (object identity).
     """
+    # Per-node state lives in lists indexed by node id; only object ids need a dict.
+    # objs keeps every scheduled object alive so its id() cannot be reused mid-walk.
     objid_to_nodeid: Dict[int, int] = {}
-    nodes: Dict[int, SumNode] = {}
-    expanded: Set[int] = set()
-    nid_to_obj: Dict[int, Any] = {}
-    next_id = 0
-    to_expand: List[Tuple[Any, int]] = []
-
-    def get_node_id(obj: Any, kind: str) -> int:
-        nonlocal next_id
-        oid = id(obj)
-        if oid in objid_to_nodeid:
-            return objid_to_nodeid[oid]
-        nid = next_id
-        next_id += 1
-        objid_to_nodeid[oid] = nid
-        nodes[nid] = SumNode(kind=kind)
-        return nid
+    nodes: List[SumNode] = []
+    objs: List[Any] = []
+    expanded = bytearray()
+    to_expand: List[int] = []
 
-    def schedule(obj: Any) -> int:
-        kind = classify_value(obj)
+    def schedule(obj: Any, kind: str) -> int:
         if kind == "eager":
             raise AssertionError("schedule() should not be called for eager values")
-        nid = get_node_id(obj, kind)
-        if nid not in expanded and nid not in nid_to_obj:
-            nid_to_obj[nid] = obj
-            to_expand.append((obj, nid))
+        oid = id(obj)
+        nid = objid_to_nodeid.get(oid)
+        if nid is None:
+            nid = len(nodes)
+            objid_to_nodeid[oid] = nid
+            nodes.append(SumNode(kind=kind))
+            objs.append(obj)
+            expanded.append(0)
+            to_expand.append(nid)
         return nid
 
-    root_id = schedule(root_obj)
+    root_id = schedule(root_obj, classify_value(root_obj))
 
     while to_expand:
-        obj, nid = to_expand.pop()
-        if nid in expanded:
+        nid = to_expand.pop()
+        if expanded[nid]:
             continue
         node = nodes[nid]
-        for name, val in safe_iter_members(obj):
-            if not isinstance(name, str):
-                continue
-            if not is_public_name(name, include_private):
+        for name, val in _iter_public_members(objs[nid], include_private):
+            # Shared objects (re-exports, back-edges) reuse their node without re-classifying.
+            seen_id = objid_to_nodeid.get(id(val))
+            if seen_id is not None:
+                node.children[name] = seen_id
                 continue
 
             try:
@@ -193,38 +189,43 @@ def build_summary(
                 node.eager.add(name)
                 continue
 
-            child_id = schedule(val)
-            node.children[name] = child_id
+            node.children[name] = schedule(val, ck)
 
-        expanded.add(nid)
-
-    # Convert nodes to JSON-serializable form
-    out_nodes: Dict[str, Any] = {}
-    for nid, n in nodes.items():
-        out_nodes[str(nid)] = {
-            "kind": n.kind,
-            "children": dict(sorted(n.children.items())),
-            "eager": sorted(n.eager),
-        }
+        expanded[nid] = 1
 
+    # Convert nodes to JSON-serializable form: parallel arrays indexed by node id.
+    # children order is irrelevant at runtime; the JSON dump sorts keys for stable output.
     return {
         "root": root_id,
-        "nodes": out_nodes,
+        "kinds": [n.kind for n in nodes],
+        "children": [n.children for n in nodes],
+        "eager": [sorted(n.eager) for n in nodes],
     }
 
-def _build_pip_to_modules_map() -> Dict[str, List[str]]:
-    pip_to_mods: Dict[str, List[str]] = {}
-    for mod, dists in importlib_metadata.packages_distributions().items():
-        for dist in dists:
-            key = _normalize_name(dist)
-            pip_to_mods.setdefault(key, []).append(mod)
-    return pip_to_mods
+def _dist_import_names(pip_name: str) -> List[str]:
+    """
+    Top-level import names provided by one installed distribution, read from that
+    distribution's own metadata rather than by scanning every installed one.
+    """
+    try:
+        dist = importlib_metadata.distribution(pip_name)
+    except importlib_metadata.PackageNotFoundError:
+        return []
+    top_level = dist.read_text("top_level.txt")
+    if top_level:
+        return [line.strip() for line in top_level.splitlines() if line.strip()]
+    # Wheels not built by setuptools usually lack top_level.txt; infer it from RECORD.
+    names: Set[str] = set()
+    for f in dist.files or ():
+        top = f.parts[0] if len(f.parts) > 1 else inspect.getmodulename(f.name)
+        if top and top.isidentifier() and top != "__pycache__":
+            names.add(top)
+    return sorted(names)
 
 
 def _parse_extra_modules(
     pyproject_path: Path,
     extra_name: str,
-    pip_to_modules: Dict[str, List[str]],
 ) -> List[Tuple[str, str, str]]:
     with pyproject_path.open("rb") as f:
         data = tomllib.load(f)
@@ -240,12 +241,11 @@ def _parse_extra_modules(
     modules: List[Tuple[str, str, str]] = []
     seen: Set[str] = set()
     for dep in deps:
-        m = re.match(r"[A-Za-z0-9_.-]+", dep)
+        m = _DEP_NAME_RE.match(dep)
         if not m:
             continue
         pip_name = m.group(0).split("[", 1)[0]
-        pip_key = _normalize_name(pip_name)
-        mod_candidates = pip_to_modules.get(pip_key)
+        mod_candidates = _dist_import_names(pip_name)
         if not mod_candidates:
             raise KeyError(f"could not resolve import module for pip package {pip_name!r}")
         for import_name in mod_candidates:
@@ -257,29 +257,137 @@ def _parse_extra_modules(
     return modules
 
 
+_IMPORTS_INIT_HEADER = """\
+from __future__ import annotations
+
+from pathlib import Path
+from deps_on_demand import LazyModuleProxy as _LazyModuleProxy
+
+# Module metadata is inlined so importing a real module never reads its JSON summary;
+# a summary is only parsed if its module turns out to be missing.
+_base = Path(__file__).parent
+
+"""
+
+_IMPORTS_INIT_ENTRY = (
+    "{symbol} = _LazyModuleProxy({symbol!r}, _base, module={module!r}, extra={extra!r}, "
+    "explicit_child_modules={children!r})\n"
+)
+
+
 def _write_imports_init(
     imports_dir: Path,
 ) -> None:
-    lines: List[str] = []
-    lines.append("from __future__ import annotations")
-    lines.append("")
-    lines.append("import json")
-    lines.append("from pathlib import Path")
-    lines.append("import deps_on_demand")
-    lines.append("")
-    lines.append("names: list[str] = []")
-    lines.append("base = Path(__file__).parent")
-    lines.append("for path in base.glob(\"*.json\"):")
-    lines.append("    name = path.stem")
-    lines.append("    names.append(name)")
-    lines.append("    with path.open(\"r\", encoding=\"utf-8\") as f:")
-    lines.append("        data = json.load(f)")
-    lines.append("    globals()[name] = deps_on_demand.LazyModuleProxy(name, base)")
-    lines.append("")
-    lines.append("__all__ = names")
-    lines.append("")
-
-    imports_dir.joinpath("__init__.py").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    # Every bundle in the directory is exposed, including ones written for other extras.
+    stems = {path.name.split(".", 1)[0] for pattern in ("*.json", "*.json.zst") for path in imports_dir.glob(pattern)}
+    symbols: List[str] = []
+    parts: List[str] = [_IMPORTS_INIT_HEADER]
+    for symbol in sorted(stems):
+        path = bundle_path(imports_dir, symbol)
+        if path.suffix == ".zst" and zstandard is None:
+            # e.g. left by an earlier --compress run for another extra
+            print(f"warning: skipping {path}: reading it requires the 'zstandard' package", file=sys.stderr)
+            continue
+        data = read_bundle(path)
+        symbols.append(symbol)
+        parts.append(
+            _IMPORTS_INIT_ENTRY.format(
+                symbol=symbol,
+                module=data.get("module", symbol),
+                extra=data.get("extra"),
+                children=tuple(data.get("explicit_child_modules", ())),
+            )
+        )
+    parts.append(f"\n__all__ = {symbols!r}\n")
+    imports_dir.joinpath("__init__.py").write_text("".join(parts), encoding="utf-8")
+
+
+def _try_import(modname: str) -> Optional[BaseException]:
+    try:
+        importlib.import_module(modname)
+    except BaseException as e:
+        return e
+    return None
+
+
+def _failed_from_threading(e: BaseException) -> bool:
+    """
+    Whether an import error may only be an artifact of importing on a worker thread: an
+    import-lock deadlock, a module another thread was still initializing, or a module
+    that installs signal handlers (allowed only on the main thread).
+    """
+    if type(e).__name__ == "_DeadlockError":
+        return True
+    msg = str(e)
+    return "partially initialized" in msg or "circular import" in msg or "main thread" in msg
+
+
+def _import_children(children: List[str]) -> List[Tuple[str, BaseException]]:
+    """
+    Import the public, non-test submodules in `children` so they show up in the summary.
+    Returns the (child, error) pairs that failed. Run it under _silence_imports().
+    """
+    wanted: List[str] = []
+    for child in children:
+        # Skip private/internal submodules.
+        parts = child.split(".")
+        if any(part.startswith("_") for part in parts):
+            continue
+        if "tests" in parts or "testing" in parts:
+            continue
+        wanted.append(child)
+
+    # Imports are mostly filesystem I/O, so they overlap well across threads. The threads
+    # rely on the caller's silencing: redirect_stdout swaps a process-global, which is not
+    # safe to do from several threads at once.
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        errors = list(ex.map(_try_import, wanted))
+    # Retry serially (on this thread) only the failures the threading itself can cause;
+    # a child that is genuinely broken (e.g. missing its own dependency) isn't imported twice.
+    errors = [
+        _try_import(child) if e is not None and _failed_from_threading(e) else e
+        for child, e in zip(wanted, errors)
+    ]
+    return [(child, e) for child, e in zip(wanted, errors) if e is not None]
+
+
+class _IntrospectionError(Exception):
+    pass
+
+
+def _generate_one(
+    pip_name: str,
+    import_name: str,
+    symbol_name: str,
+    extra: str,
+    include_private: bool,
+    compress: bool,
+) -> Tuple[str, bytes]:
+    """
+    Import and summarize one module (runs in a worker process).
+    Returns (symbol_name, encoded JSON payload).
+    """
+    # Silence once for the whole job rather than around every individual import.
+    with _silence_imports():
+        try:
+            real_mod = importlib.import_module(import_name)
+        except Exception as e:
+            raise _IntrospectionError(f"could not import {import_name!r} for introspection: {e!r}") from None
+
+        explicit_children = submodules_requiring_import(import_name)
+        skipped = _import_children(explicit_children)
+        summary = build_summary(real_mod, include_private=include_private)
+
+    for child, e in skipped:
+        print(f"warning: skipped submodule {child!r} due to import error: {e!r}", file=sys.stderr)
+    payload = {
+        "pip_name": pip_name,
+        "module": import_name,
+        "summary": summary,
+        "extra": extra,
+        "explicit_child_modules": explicit_children,
+    }
+    return symbol_name, dump_bundle(payload, compress)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -292,17 +400,24 @@ def main(argv: Optional[List[str]] = None) -> int:
     ap.add_argument("extra", help="Extra name from [project.optional-dependencies]")
     ap.add_argument("pyproject", nargs="?", default="pyproject.toml", help="Path to pyproject.toml (default: pyproject.toml)")
     ap.add_argument("--include-private", action="store_true", help="Include private members (names starting with _)")
+    ap.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write zstd-compressed .json.zst bundles (requires zstandard here and wherever the bundles are read)",
+    )
 
     args = ap.parse_args(argv)
+    if args.compress and zstandard is None:
+        print("error: --compress requires the 'zstandard' package", file=sys.stderr)
+        return 2
+    payload_suffix = ".json.zst" if args.compress else ".json"
     pyproject_path = Path(args.pyproject)
     if not pyproject_path.exists():
         print(f"error: pyproject file not found: {pyproject_path}", file=sys.stderr)
         return 2
 
-    pip_to_modules = _build_pip_to_modules_map()
-
     try:
-        modules = _parse_extra_modules(pyproject_path, args.extra, pip_to_modules)
+        modules = _parse_extra_modules(pyproject_path, args.extra)
     except KeyError as e:
         print(f"error: {e}", file=sys.stderr)
         return 2
@@ -310,43 +425,34 @@ def main(argv: Optional[List[str]] = None) -> int:
     imports_dir = Path("imports")
     imports_dir.mkdir(parents=True, exist_ok=True)
 
-    written: List[Tuple[str, str, str]] = []
-    for pip_name, import_name, symbol_name in modules:
-        try:
-            real_mod = _quiet_import(import_name)
-        except Exception as e:
-            print(f"error: could not import {import_name!r} for introspection: {e!r}", file=sys.stderr)
-            return 2
-
-        explicit_children = _submodules_requiring_import(import_name)
-        for child in explicit_children:
-            # Skip private/internal submodules.
-            parts = child.split(".")
-            if any(part.startswith("_") for part in parts):
-                continue
-            if "tests" in parts or "testing" in parts:
-                continue
+    # Each module is imported and introspected in its own worker process: the work is
+    # independent per module, and imports must not leak into each other's sys.modules.
+    # Workers are not reused (max_tasks_per_child=1), so what a summary sees never
+    # depends on which modules happened to share a process.
+    done: Set[str] = set()
+    workers = max(1, min(len(modules), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as ex:
+        futures = [
+            ex.submit(
+                _generate_one, pip_name, import_name, symbol_name, args.extra, args.include_private, args.compress
+            )
+            for pip_name, import_name, symbol_name in modules
+        ]
+        for future in as_completed(futures):
             try:
-                _quiet_import(child)
-            except BaseException as e:
-                print(f"warning: skipped submodule {child!r} due to import error: {e!r}", file=sys.stderr)
-
-        with _silence_imports():
-            summary = build_summary(real_mod, include_private=args.include_private)
-        out_path = imports_dir / f"{symbol_name}.json"
-        if out_path.exists():
-            out_path.unlink()
-        payload = {
-            "pip_name": pip_name,
-            "module": import_name,
-            "summary": summary,
-            "extra": args.extra,
-            "explicit_child_modules": explicit_children,
-        }
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2, sort_keys=True)
-            f.write("\n")
-        written.append((pip_name, import_name, symbol_name))
+                symbol_name, payload_bytes = future.result()
+            except _IntrospectionError as e:
+                for pending in futures:
+                    pending.cancel()
+                print(f"error: {e}", file=sys.stderr)
+                return 2
+            # Drop a bundle left in the other format so the reader cannot pick up a stale one.
+            for suffix in (".json", ".json.zst"):
+                if suffix != payload_suffix:
+                    imports_dir.joinpath(f"{symbol_name}{suffix}").unlink(missing_ok=True)
+            imports_dir.joinpath(f"{symbol_name}{payload_suffix}").write_bytes(payload_bytes)
+            done.add(symbol_name)
+    written = [m for m in modules if m[2] in done]
 
     _write_imports_init(imports_dir)
 
@@ -1,31 +1,116 @@
-import importlib
-import pkgutil
+from importlib import import_module as _import_module
+import inspect
+import json
+import os
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson is not installed
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for *.json.zst bundles (shimgen2 --compress)
+    zstandard = None
+
+def _is_package_dir(path: str) -> bool:
+    try:
+        return any(inspect.getmodulename(name) == "__init__" for name in os.listdir(path))
+    except OSError:
+        return False
+
+def _iter_submodule_names(paths: Iterable[str], prefix: str) -> Iterator[str]:
+    """
+    Yield the dotted names of all modules/packages below `paths`, found the way
+    pkgutil.walk_packages finds them but by scanning directories, so nothing is imported.
+    """
+    seen: set[str] = set()
+    stack: list[tuple[str, str]] = [(path, prefix) for path in paths]
+    while stack:
+        path, pfx = stack.pop()
+        try:
+            # sorted: handle packages before same-named modules
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError:
+            # ignore unreadable directories like import does
+            continue
+        for entry in entries:
+            modname = inspect.getmodulename(entry.name)
+            if modname == "__init__":
+                continue
+            if not modname and "." not in entry.name and entry.is_dir():
+                if not _is_package_dir(entry.path):
+                    continue
+                modname = entry.name
+                if pfx + modname not in seen:
+                    stack.append((entry.path, f"{pfx}{modname}."))
+            if not modname or "." in modname or pfx + modname in seen:
+                continue
+            seen.add(pfx + modname)
+            yield pfx + modname
+
+def _collect_bound(module: ModuleType, prefix: str, out: set[str]) -> None:
+    """
+    Add the dotted name of every attribute bound on `module` (and, recursively, on the
+    submodules it exposes under their own name) to `out`. Reads __dict__ directly so
+    probing a name never runs module __getattr__ hooks or builds an AttributeError.
+    """
+    for name, value in vars(module).items():
+        full = f"{prefix}.{name}"
+        if full in out:
+            continue
+        out.add(full)
+        if isinstance(value, ModuleType) and getattr(value, "__name__", None) == full:
+            _collect_bound(value, full, out)
 
 def submodules_requiring_import(modname: str) -> list[str]:
     """
     List fully-qualified submodules under `modname` that are not already
     accessible as attributes after importing `modname` itself.
     """
-    root = importlib.import_module(modname)
+    root = _import_module(modname)
     if not hasattr(root, "__path__"):
         return []  # not a package, no submodules
 
-    base_parts = modname.split(".")
-    need_import: list[str] = []
-
-    for info in pkgutil.walk_packages(root.__path__, root.__name__ + "."):
-        full = info.name
-        # Determine the attribute path relative to the root module
-        rel_parts = full.split(".")[len(base_parts):]
-
-        obj = root
-        missing = False
-        for part in rel_parts:
-            if not hasattr(obj, part):
-                missing = True
-                break
-            obj = getattr(obj, part)
-        if missing:
-            need_import.append(full)
-
-    return sorted(need_import)
\ No newline at end of file
+    bound: set[str] = set()
+    _collect_bound(root, root.__name__, bound)
+    need_import = [
+        full
+        for full in _iter_submodule_names(root.__path__, root.__name__ + ".")
+        if full not in bound
+    ]
+
+    return sorted(need_import)
+
+def bundle_path(base: Path, stem: str) -> Path:
+    """
+    Path of the shim bundle for `stem` under `base`: the .json.zst one when present and
+    readable here, otherwise the plain .json one (which may not exist).
+    """
+    compressed = base / f"{stem}.json.zst"
+    plain = base / f"{stem}.json"
+    if compressed.exists() and (zstandard is not None or not plain.exists()):
+        return compressed
+    return plain
+
+def read_bundle(path: Path) -> dict[str, Any]:
+    raw = path.read_bytes()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise ModuleNotFoundError(f"the 'zstandard' package is required to read shim bundle {path}")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def dump_bundle(payload: dict[str, Any], compress: bool = False) -> bytes:
+    if orjson is not None:
+        data = orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) + b"\n"
+    else:
+        # Encode once, rather than pushing every encoder chunk through a text wrapper.
+        data = json.dumps(payload, indent=2, sort_keys=True).encode("utf-8") + b"\n"
+    if compress:
+        # Summaries of large packages run to megabytes of highly repetitive JSON.
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    return data
@@ -0,0 +1,35 @@
+import json
+import sys
+import types
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "main"))
+
+from deps_on_demand.cli import build_summary
+from deps_on_demand.helpers import dump_bundle
+
+
+class _Name(str):
+    pass
+
+
+class BuildSummaryTest(unittest.TestCase):
+    def test_str_subclass_keys_are_summarized_as_plain_str(self) -> None:
+        mod = types.ModuleType("aliasmod")
+        mod.f = len
+        # e.g. `globals()[_Name("alias")] = f` in a real package
+        vars(mod)[_Name("alias")] = len
+
+        summary = build_summary(mod, include_private=False)
+
+        root_children = summary["children"][summary["root"]]
+        self.assertEqual(sorted(root_children), ["alias", "f"])
+        self.assertTrue(all(type(name) is str for name in root_children))
+        # Must encode with whichever JSON backend is installed (orjson rejects str subclasses).
+        decoded = json.loads(dump_bundle({"summary": summary}))
+        self.assertEqual(decoded["summary"], summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
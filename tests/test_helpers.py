@@ -0,0 +1,55 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "main"))
+
+from deps_on_demand.helpers import submodules_requiring_import
+
+
+class SubmodulesRequiringImportTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name) / "walkpkg"
+        files = {
+            # `bound` is imported by the package itself, so it needs no explicit import.
+            "__init__.py": "from . import bound\n",
+            "bound.py": "",
+            "util.py": "",
+            "data.txt": "",
+            "notapkg/stray.py": "",
+            # Importing `sub` would bind `util` on the root as a side effect.
+            "sub/__init__.py": "from .. import util\n",
+            "sub/deep.py": "",
+        }
+        for rel, text in files.items():
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+        sys.path.insert(0, tmp.name)
+        self.addCleanup(sys.path.remove, tmp.name)
+        self.addCleanup(self._forget_modules)
+
+    @staticmethod
+    def _forget_modules() -> None:
+        for name in [name for name in sys.modules if name.split(".")[0] == "walkpkg"]:
+            del sys.modules[name]
+
+    def test_lists_unbound_submodules_without_importing_them(self) -> None:
+        self.assertEqual(
+            submodules_requiring_import("walkpkg"),
+            ["walkpkg.sub", "walkpkg.sub.deep", "walkpkg.util"],
+        )
+        # Unlike pkgutil.walk_packages, discovery doesn't import subpackages, so their
+        # import-time side effects (binding walkpkg.util here) don't hide anything.
+        self.assertNotIn("walkpkg.sub", sys.modules)
+        self.assertNotIn("walkpkg.util", sys.modules)
+
+    def test_plain_module_has_no_submodules(self) -> None:
+        self.assertEqual(submodules_requiring_import("walkpkg.bound"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import sys
+import types
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "main"))
+
+from deps_on_demand import LazyModuleProxy
+
+_SUMMARY = {"root": 0, "kinds": ["ns", "fn"], "children": [{"f": 1}, {}], "eager": [["CONST"], []]}
+
+
+class RealModuleTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mod = types.ModuleType("proxytarget")
+        self.mod.x = 1
+        sys.modules["proxytarget"] = self.mod
+        self.addCleanup(sys.modules.pop, "proxytarget", None)
+        self.proxy = LazyModuleProxy("proxytarget", _SUMMARY)
+
+    def test_sees_later_changes_to_the_module(self) -> None:
+        self.assertEqual(self.proxy.x, 1)
+        self.mod.x = 2  # e.g. monkeypatch.setattr / mock.patch.object / importlib.reload
+        self.assertEqual(self.proxy.x, 2)
+        del self.mod.x
+        self.assertFalse(hasattr(self.proxy, "x"))
+
+    def test_writes_and_vars_go_to_the_module(self) -> None:
+        self.proxy.y = 3
+        self.assertEqual(self.mod.y, 3)
+        del self.proxy.y
+        self.assertFalse(hasattr(self.mod, "y"))
+        self.assertIs(vars(self.proxy), vars(self.mod))
+
+
+class MissingModuleTest(unittest.TestCase):
+    def test_shim_raises_install_hint(self) -> None:
+        proxy = LazyModuleProxy("deps_on_demand_surely_missing", _SUMMARY)
+        self.assertIs(proxy.f, proxy.f)
+        with self.assertRaises(ModuleNotFoundError):
+            proxy.f()
+        with self.assertRaises(ModuleNotFoundError):
+            proxy.CONST
+        with self.assertRaises(AttributeError):
+            proxy.nope
+
+
+if __name__ == "__main__":
+    unittest.main()